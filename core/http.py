@@ -0,0 +1,17 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def create_session(pool_connections: int = 4, pool_maxsize: int = 16,
+                   retries: int = 3, backoff_factor: float = 0.5) -> requests.Session:
+    session = requests.Session()
+    session.headers['Connection'] = 'keep-alive'
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=Retry(total=retries, backoff_factor=backoff_factor,
+                          status_forcelist=[429, 500, 502, 503, 504]),
+    )
+    session.mount('https://', adapter)
+    return session
@@ -31,6 +31,15 @@ def parse_student_entry(entry: str) -> Student:
     return Student(email=entry.lower(), name="", first_name="", last_name="")
 
 
+def parse_name_email(name: str, email: str) -> Student:
+    name = name.replace(', ', '. ')
+    parts = email.split()
+    if len(parts) != 1:
+        return parse_student_entry(f"{name} {email}")
+    name = ' '.join(name.split())
+    return Student(email=parts[0].lower(), name=name, first_name=name, last_name="")
+
+
 def parse_stock_pitch_row(row: Dict[str, str]) -> List[Student]:
     emails = [e.strip() for e in row.get('email_address', '').split(';') if '@' in e]
     names = [n.strip() for n in row.get('full_name', '').split(';') if n.strip()]
@@ -22,7 +22,7 @@ class ResultsSaver:
             'generated_at': datetime.now().isoformat(),
             'success_rate': results.get('success_rate', '0%'),
         }
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(out, f, indent=2, ensure_ascii=False)
+        with open(filename, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            f.write(json.dumps(out, indent=2, ensure_ascii=False))
         logger.info(f"Results saved to {filename}")
         return filename
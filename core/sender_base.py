@@ -1,15 +1,21 @@
 import time
 import logging
-from typing import List, Dict
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, List, Sized
 from abc import ABC, abstractmethod
 
 from core.models import EmailConfig, Student
+from core.rate_limit import TokenBucket
 from core.template_engine import EmailTemplateEngine, embed_images
 
 logger = logging.getLogger(__name__)
 
 
 class BaseEmailSender(ABC):
+    default_rate_per_sec = 1 / 3
+    default_burst = 1
 
     def __init__(self, config: EmailConfig):
         self.config = config
@@ -49,44 +55,81 @@ class BaseEmailSender(ABC):
                                    cc: List[str] = None, bcc: List[str] = None) -> bool:
         return self.send_one(to_email, subject, body, attachment_path=attachment_path, cc=cc, bcc=bcc)
 
-    def send_bulk(self, students: List[Student], engine: EmailTemplateEngine,
+    def prepare(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send_bulk(self, students: Iterable[Student], engine: EmailTemplateEngine,
                   batch_size: int = 50, batch_delay_min: int = 1,
-                  attachment_path: str = None, cc: List[str] = None, bcc: List[str] = None) -> Dict[str, int]:
-        results = {'sent': 0, 'failed': 0}
-        total = len(students)
-
-        for start in range(0, total, batch_size):
-            end = min(start + batch_size, total)
-            batch_num = start // batch_size + 1
-            total_batches = (total + batch_size - 1) // batch_size
-            logger.info(f"Batch {batch_num}/{total_batches} (emails {start+1}-{end} of {total})")
-
-            for student in students[start:end]:
-                try:
-                    content = engine.create_personalized_email(student)
-                    body = embed_images(content['body'])
-                    ok = self.send_one(student.email, content['subject'], body, attachment_path, cc=cc, bcc=bcc)
-                    results['sent' if ok else 'failed'] += 1
-                    if ok:
-                        logger.info(f"Sent to {student.email}")
+                  attachment_path: str = None, cc: List[str] = None, bcc: List[str] = None,
+                  max_workers: int = 1, rate_per_sec: float = None, burst: int = None,
+                  results: Dict[str, int] = None) -> Dict[str, int]:
+        if results is None:
+            results = {'sent': 0, 'failed': 0}
+        lock = threading.Lock()
+        limiter = TokenBucket(rate_per_sec or self.default_rate_per_sec, burst or self.default_burst)
+        total = len(students) if isinstance(students, Sized) else None
+        remaining = iter(students)
+
+        def send_to(student: Student):
+            limiter.acquire()
+            self._send_to_student(student, engine, results, lock, attachment_path, cc, bcc)
+
+        try:
+            engine.inline_images()
+            try:
+                self.prepare()
+            except Exception as e:
+                logger.warning(f"Could not prepare {type(self).__name__}, resolving per send: {e}")
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                start = 0
+                batch = list(islice(remaining, batch_size))
+                while batch:
+                    end = start + len(batch)
+                    batch_num = start // batch_size + 1
+                    if total is None:
+                        logger.info(f"Batch {batch_num} (emails {start+1}-{end})")
                     else:
-                        logger.error(f"Failed for {student.email}")
-                except Exception as e:
-                    results['failed'] += 1
-                    logger.error(f"Error for {student.email}: {e}")
-                time.sleep(3)
+                        total_batches = (total + batch_size - 1) // batch_size
+                        logger.info(f"Batch {batch_num}/{total_batches} (emails {start+1}-{end} of {total})")
 
-            if end < total:
-                logger.info(f"Batch done. Waiting {batch_delay_min} min...")
-                time.sleep(batch_delay_min * 60)
+                    list(pool.map(send_to, batch))
+
+                    start = end
+                    batch = list(islice(remaining, batch_size))
+                    if batch:
+                        logger.info(f"Batch done. Waiting {batch_delay_min} min...")
+                        time.sleep(batch_delay_min * 60)
+        finally:
+            self.close()
 
         logger.info(f"All done — sent: {results['sent']}, failed: {results['failed']}")
         return results
 
-    def send_bulk_emails(self, students: List[Student], template_engine: EmailTemplateEngine,
+    def _send_to_student(self, student: Student, engine: EmailTemplateEngine, results: Dict[str, int],
+                         lock: threading.Lock, attachment_path: str = None,
+                         cc: List[str] = None, bcc: List[str] = None):
+        try:
+            content = engine.create_personalized_email(student)
+            ok = self.send_one(student.email, content['subject'], content['body'], attachment_path, cc=cc, bcc=bcc)
+            if ok:
+                logger.info(f"Sent to {student.email}")
+            else:
+                logger.error(f"Failed for {student.email}")
+        except Exception as e:
+            ok = False
+            logger.error(f"Error for {student.email}: {e}")
+        with lock:
+            results['sent' if ok else 'failed'] += 1
+
+    def send_bulk_emails(self, students: Iterable[Student], template_engine: EmailTemplateEngine,
                         batch_size: int = 50, batch_delay_minutes: int = 1,
-                        attachment_path: str = None, cc: List[str] = None, bcc: List[str] = None) -> Dict[str, int]:
-        return self.send_bulk(students, template_engine, batch_size, batch_delay_minutes, attachment_path, cc=cc, bcc=bcc)
+                        attachment_path: str = None, cc: List[str] = None, bcc: List[str] = None,
+                        max_workers: int = 1, rate_per_sec: float = None, burst: int = None) -> Dict[str, int]:
+        return self.send_bulk(students, template_engine, batch_size, batch_delay_minutes, attachment_path,
+                              cc=cc, bcc=bcc, max_workers=max_workers, rate_per_sec=rate_per_sec, burst=burst)
 
 
 def create_sender(config: EmailConfig) -> BaseEmailSender:
@@ -5,41 +5,62 @@ import time
 import base64
 import mimetypes
 import logging
+import threading
 import urllib.parse
 import webbrowser
 import email.mime.text
 import email.mime.multipart
-import email.mime.image
 import email.mime.base
 import email.header
 import email.encoders
 from pathlib import Path
-from typing import List
-from datetime import datetime
+from functools import lru_cache
+from typing import List, Tuple
+from datetime import datetime, timezone
 
 import requests
-import pytz
 
+from core.http import create_session
 from core.models import EmailConfig
 from core.sender_base import BaseEmailSender
 
 logger = logging.getLogger(__name__)
 
+_MAX_MESSAGE_BYTES = 35 * 1024 * 1024
+_RETRY_AFTER_RE = re.compile(r'Retry after (\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{3}Z)')
+
 
 class GmailOAuth2Manager:
 
-    def __init__(self, config: EmailConfig):
+    def __init__(self, config: EmailConfig, session: requests.Session = None):
         self.config = config
+        self.session = session or create_session(pool_maxsize=32, backoff_factor=0.3)
         self.token_file = "gmail_token.json"
         self._access_token = None
         self._refresh_token = None
+        self._expires_at = None
+        self._token_loaded = False
+        self._lock = threading.Lock()
 
     def get_access_token(self) -> str:
-        if self._load_existing_token() and self._access_token:
-            return self._access_token
-        if self._refresh_token and self._refresh_access_token():
-            return self._access_token
-        return self._start_oauth_flow()
+        with self._lock:
+            if not self._token_loaded:
+                self._token_loaded = True
+                self._load_existing_token()
+            if self._token_valid():
+                return self._access_token
+            if self._refresh_token and self._refresh_access_token():
+                return self._access_token
+            return self._start_oauth_flow()
+
+    def refresh_if_stale(self, stale_token: str) -> bool:
+        with self._lock:
+            if self._access_token != stale_token:
+                return True
+            return bool(self._refresh_token) and self._refresh_access_token()
+
+    def _token_valid(self) -> bool:
+        return bool(self._access_token) and (self._expires_at is None or time.time() < self._expires_at)
 
     def _load_existing_token(self) -> bool:
         try:
@@ -48,29 +69,43 @@ class GmailOAuth2Manager:
                     data = json.load(f)
                 self._access_token = data.get('access_token')
                 self._refresh_token = data.get('refresh_token')
+                self._expires_at = data.get('expires_at')
                 return True
         except Exception:
             pass
         return False
 
     def _save_token(self, data: dict):
-        with open(self.token_file, 'w') as f:
-            json.dump(data, f)
+        tmp_file = f"{self.token_file}.tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                f.write(json.dumps(data))
+            os.replace(tmp_file, self.token_file)
+        except Exception:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+
+    def _store_token(self, data: dict):
+        self._access_token = data["access_token"]
+        self._refresh_token = data.get("refresh_token", self._refresh_token)
+        self._expires_at = time.time() + data.get("expires_in", 3600) - 60
+        self._save_token({
+            "access_token": self._access_token,
+            "refresh_token": self._refresh_token,
+            "expires_at": self._expires_at,
+        })
 
     def _refresh_access_token(self) -> bool:
         try:
-            resp = requests.post("https://oauth2.googleapis.com/token", data={
+            resp = self.session.post("https://oauth2.googleapis.com/token", data={
                 "client_id": self.config.client_id,
                 "client_secret": self.config.client_secret,
                 "refresh_token": self._refresh_token,
                 "grant_type": "refresh_token",
-            })
+            }, timeout=30)
             resp.raise_for_status()
-            data = resp.json()
-            self._access_token = data["access_token"]
-            if "refresh_token" in data:
-                self._refresh_token = data["refresh_token"]
-            self._save_token({"access_token": self._access_token, "refresh_token": self._refresh_token})
+            self._store_token(resp.json())
             return True
         except Exception as e:
             logger.error(f"Token refresh failed: {e}")
@@ -90,48 +125,60 @@ class GmailOAuth2Manager:
         logger.info(f"Auth URL: {url}")
         code = input("\n\U0001f510 Paste authorization code: ").strip()
 
-        resp = requests.post("https://oauth2.googleapis.com/token", data={
+        resp = self.session.post("https://oauth2.googleapis.com/token", data={
             "client_id": self.config.client_id,
             "client_secret": self.config.client_secret,
             "code": code,
             "grant_type": "authorization_code",
             "redirect_uri": "urn:ietf:wg:oauth:2.0:oob",
-        })
+        }, timeout=30)
         resp.raise_for_status()
-        data = resp.json()
-        self._access_token = data["access_token"]
-        self._refresh_token = data.get("refresh_token")
-        self._save_token({"access_token": self._access_token, "refresh_token": self._refresh_token})
+        self._store_token(resp.json())
         return self._access_token
 
 
 class GmailEmailSender(BaseEmailSender):
+    default_rate_per_sec = 2.0
+    default_burst = 5
 
     def __init__(self, config: EmailConfig):
         super().__init__(config)
-        self.oauth = GmailOAuth2Manager(config)
+        self.session = create_session(pool_maxsize=32, backoff_factor=0.3)
+        self.oauth = GmailOAuth2Manager(config, self.session)
 
     def send_one(self, to_email, subject, body, attachment_path=None, cc=None, bcc=None):
         token = self.oauth.get_access_token()
 
         if attachment_path:
-            msg = self._build_attachment_message(to_email, subject, body, attachment_path, cc=cc, bcc=bcc)
+            raw = self._build_attachment_message(to_email, subject, body, attachment_path, cc=cc, bcc=bcc).as_bytes()
         else:
-            msg = email.mime.text.MIMEText(body, 'html', 'utf-8')
-            msg['To'] = to_email
-            msg['From'] = self.config.sender_email
-            msg['Subject'] = email.header.Header(subject, 'utf-8')
-            if cc:
-                msg['Cc'] = ','.join(cc) if isinstance(cc, list) else cc
-            if bcc:
-                msg['Bcc'] = ','.join(bcc) if isinstance(bcc, list) else bcc
+            try:
+                raw = self._build_html_message(to_email, subject, body, cc=cc, bcc=bcc)
+            except ValueError as e:
+                logger.error(f"Refusing to send to {to_email!r}: {e}")
+                return False
 
-        return self._send_via_api(msg, token, to_email)
+        return self._send_via_api(raw, token, to_email)
 
-    def _build_attachment_message(self, to_email, subject, body, path, cc=None, bcc=None):
-        p = Path(path)
-        mime_type = mimetypes.guess_type(str(p))[0] or 'application/octet-stream'
+    def close(self):
+        self.session.close()
+
+    def _build_html_message(self, to_email, subject, body, cc=None, bcc=None) -> bytes:
+        headers = [
+            'Content-Type: text/html; charset="utf-8"',
+            'MIME-Version: 1.0',
+            'Content-Transfer-Encoding: base64',
+            f'To: {_header_value(to_email)}',
+            f'From: {_header_value(self.config.sender_email)}',
+            f'Subject: {email.header.Header(subject, "utf-8").encode()}',
+        ]
+        if cc:
+            headers.append(f"Cc: {_header_value(','.join(cc) if isinstance(cc, list) else cc)}")
+        if bcc:
+            headers.append(f"Bcc: {_header_value(','.join(bcc) if isinstance(bcc, list) else bcc)}")
+        return '\n'.join(headers).encode() + b'\n\n' + base64.encodebytes(body.encode('utf-8'))
 
+    def _build_attachment_message(self, to_email, subject, body, path, cc=None, bcc=None):
         msg = email.mime.multipart.MIMEMultipart()
         msg['To'] = to_email
         msg['From'] = self.config.sender_email
@@ -141,66 +188,73 @@ class GmailEmailSender(BaseEmailSender):
         if bcc:
             msg['Bcc'] = ','.join(bcc) if isinstance(bcc, list) else bcc
         msg.attach(email.mime.text.MIMEText(body, 'html', 'utf-8'))
-
-        att = email.mime.base.MIMEBase(*mime_type.split('/'))
-        att.set_payload(p.read_bytes())
-        email.encoders.encode_base64(att)
-        att.add_header('Content-Disposition', f'attachment; filename="{p.name}"')
-        msg.attach(att)
+        msg.attach(_load_attachment_part(path))
         return msg
 
-    def _send_via_api(self, message, token, to_email, _retried=False) -> bool:
-        raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
+    def _send_via_api(self, raw_message: bytes, token, to_email, _retried=False) -> bool:
+        if len(raw_message) * 4 // 3 > _MAX_MESSAGE_BYTES:
+            logger.error(f"Message to {to_email} exceeds Gmail's 35 MB limit ({len(raw_message)} bytes before encoding)")
+            return False
+        payload = b'{"raw":"' + base64.urlsafe_b64encode(raw_message) + b'"}'
         url = "https://gmail.googleapis.com/gmail/v1/users/me/messages/send"
         headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
 
         try:
-            resp = requests.post(url, headers=headers, json={"raw": raw})
+            resp = self.session.post(url, headers=headers, data=payload, timeout=30)
             resp.raise_for_status()
             logger.info(f"Gmail sent to {to_email} (ID: {resp.json().get('id')})")
             return True
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 401 and not _retried:
                 logger.warning("Token expired, refreshing...")
-                if self.oauth._refresh_access_token():
-                    return self._send_via_api(message, self.oauth._access_token, to_email, _retried=True)
+                if self.oauth.refresh_if_stale(token):
+                    return self._send_via_api(raw_message, self.oauth._access_token, to_email, _retried=True)
             if e.response.status_code == 429:
-                return self._handle_rate_limit(e, url, headers, raw, to_email)
+                return self._handle_rate_limit(e, url, headers, payload, to_email)
             logger.error(f"Gmail API error for {to_email}: {e}")
             return False
         except Exception as e:
             logger.error(f"Gmail error for {to_email}: {e}")
             return False
 
-    def _handle_rate_limit(self, exc, url, headers, raw, to_email) -> bool:
+    def _handle_rate_limit(self, exc, url, headers, payload, to_email) -> bool:
         try:
-            match = re.search(r'Retry after (\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{3}Z)',
-                              exc.response.text)
+            match = _RETRY_AFTER_RE.search(exc.response.text)
             if match:
-                retry_at = datetime.strptime(match.group(1), '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=pytz.UTC)
-                wait = (retry_at - datetime.now(pytz.UTC)).total_seconds()
+                retry_at = datetime.fromisoformat(match.group(1).replace('Z', '+00:00'))
+                wait = (retry_at - datetime.now(timezone.utc)).total_seconds()
                 if 0 < wait < 3600:
                     logger.warning(f"Rate limited. Waiting {wait:.0f}s...")
                     time.sleep(wait + 5)
-                    resp = requests.post(url, headers=headers, json={"raw": raw})
+                    resp = self.session.post(url, headers=headers, data=payload, timeout=30)
                     resp.raise_for_status()
                     return True
         except Exception as e:
             logger.error(f"Rate limit handling failed: {e}")
         return False
 
-    def _embed_image(self, message: email.mime.multipart.MIMEMultipart, image_path: str, cid: str):
-        if not Path(image_path).exists():
-            logger.warning(f"Image not found: {image_path}")
-            return
 
-        with open(image_path, 'rb') as f:
-            img_data = f.read()
+def _header_value(value: str) -> str:
+    if '\r' in value or '\n' in value:
+        raise ValueError(f"header value contains a line break: {value!r}")
+    return value if value.isascii() else email.header.Header(value, 'utf-8').encode()
+
+
+def _load_attachment_part(path: str) -> email.mime.base.MIMEBase:
+    name, mime_type, payload = _load_attachment(path)
+    att = email.mime.base.MIMEBase(*mime_type.split('/'))
+    att.set_payload(payload)
+    att['Content-Transfer-Encoding'] = 'base64'
+    att.add_header('Content-Disposition', f'attachment; filename="{name}"')
+    return att
+
 
-        mime_type = mimetypes.guess_type(image_path)[0] or 'image/png'
-        main_type, sub_type = mime_type.split('/')
+@lru_cache(maxsize=None)
+def _load_attachment(path: str) -> Tuple[str, str, str]:
+    p = Path(path)
+    mime_type = mimetypes.guess_type(str(p))[0] or 'application/octet-stream'
 
-        img = email.mime.image.MIMEImage(img_data, _subtype=sub_type)
-        img.add_header('Content-ID', f'<{cid}>')
-        img.add_header('Content-Disposition', 'inline', filename=Path(image_path).name)
-        message.attach(img)
+    encoded = email.mime.base.MIMEBase(*mime_type.split('/'))
+    encoded.set_payload(p.read_bytes())
+    email.encoders.encode_base64(encoded)
+    return p.name, mime_type, encoded.get_payload()
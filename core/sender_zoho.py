@@ -1,11 +1,14 @@
 import logging
 import mimetypes
+import threading
 from pathlib import Path
-from typing import List
+from functools import lru_cache
+from typing import List, Tuple
 from datetime import datetime, timedelta
 
 import requests
 
+from core.http import create_session
 from core.models import EmailConfig
 from core.sender_base import BaseEmailSender
 
@@ -14,23 +17,31 @@ logger = logging.getLogger(__name__)
 
 class ZohoAuthManager:
 
-    def __init__(self, config: EmailConfig):
+    def __init__(self, config: EmailConfig, session: requests.Session = None):
         self.config = config
+        self.session = session or create_session()
         self.access_token = None
         self.token_expires_at = None
+        self._lock = threading.Lock()
 
     def get_access_token(self) -> str:
-        if self.access_token and self.token_expires_at and datetime.now() < self.token_expires_at:
+        if self._token_valid():
             return self.access_token
-        return self._refresh()
+        with self._lock:
+            if self._token_valid():
+                return self.access_token
+            return self._refresh()
+
+    def _token_valid(self) -> bool:
+        return bool(self.access_token and self.token_expires_at and datetime.now() < self.token_expires_at)
 
     def _refresh(self) -> str:
-        resp = requests.post("https://accounts.zoho.eu/oauth/v2/token", data={
+        resp = self.session.post("https://accounts.zoho.eu/oauth/v2/token", data={
             'grant_type': 'refresh_token',
             'client_id': self.config.client_id,
             'client_secret': self.config.client_secret,
             'refresh_token': self.config.refresh_token,
-        })
+        }, timeout=30)
         resp.raise_for_status()
         data = resp.json()
         self.access_token = data['access_token']
@@ -40,20 +51,26 @@ class ZohoAuthManager:
 
 
 class ZohoEmailSender(BaseEmailSender):
-
     def __init__(self, config: EmailConfig):
         super().__init__(config)
-        self.auth = ZohoAuthManager(config)
+        self.session = create_session()
+        self.auth = ZohoAuthManager(config, self.session)
         self.api_base = "https://mail.zoho.eu/api"
         self._account_id = None
+        self._account_lock = threading.Lock()
+        self._messages_url = None
+
+    def prepare(self):
+        self.auth.get_access_token()
+        self._get_messages_url()
 
     def send_one(self, to_email, subject, body, attachment_path=None, cc=None, bcc=None):
         token = self.auth.get_access_token()
-        acct = self._get_account_id()
+        url = self._get_messages_url()
         headers = {'Authorization': f'Zoho-oauthtoken {token}'}
 
         if attachment_path:
-            return self._send_with_attachment(to_email, subject, body, attachment_path, headers, acct, cc=cc, bcc=bcc)
+            return self._send_with_attachment(to_email, subject, body, attachment_path, headers, url, cc=cc, bcc=bcc)
 
         headers['Content-Type'] = 'application/json'
         payload = {
@@ -68,37 +85,52 @@ class ZohoEmailSender(BaseEmailSender):
         if bcc:
             payload['bccAddress'] = ','.join(bcc) if isinstance(bcc, list) else bcc
 
-        resp = requests.post(f"{self.api_base}/accounts/{acct}/messages", headers=headers, json=payload, timeout=30)
+        resp = self.session.post(url, headers=headers, json=payload, timeout=30)
         return resp.status_code == 200
 
-    def _send_with_attachment(self, to_email, subject, body, path, headers, acct, cc=None, bcc=None):
-        p = Path(path)
-        mime = mimetypes.guess_type(str(p))[0] or 'application/octet-stream'
+    def _send_with_attachment(self, to_email, subject, body, path, headers, url, cc=None, bcc=None):
         files = {
             'fromAddress': (None, self.config.sender_email),
             'toAddress': (None, to_email),
             'subject': (None, subject),
             'content': (None, body),
             'mailFormat': (None, 'html'),
-            'attachments': (p.name, p.read_bytes(), mime),
+            'attachments': _load_attachment(path),
         }
         if cc:
             files['ccAddress'] = (None, ','.join(cc) if isinstance(cc, list) else cc)
         if bcc:
             files['bccAddress'] = (None, ','.join(bcc) if isinstance(bcc, list) else bcc)
 
-        resp = requests.post(f"{self.api_base}/accounts/{acct}/messages",
-                             headers=headers, files=files, timeout=30)
+        resp = self.session.post(url, headers=headers, files=files, timeout=30)
         return resp.status_code == 200
 
+    def _get_messages_url(self):
+        if self._messages_url is None:
+            self._messages_url = f"{self.api_base}/accounts/{self._get_account_id()}/messages"
+        return self._messages_url
+
     def _get_account_id(self):
         if self._account_id:
             return self._account_id
-        token = self.auth.get_access_token()
-        resp = requests.get(f"{self.api_base}/accounts", headers={
-            'Authorization': f'Zoho-oauthtoken {token}',
-            'Content-Type': 'application/json',
-        }, timeout=30)
-        resp.raise_for_status()
-        self._account_id = resp.json()['data'][0]['accountId']
-        return self._account_id
+        with self._account_lock:
+            if self._account_id:
+                return self._account_id
+            token = self.auth.get_access_token()
+            resp = self.session.get(f"{self.api_base}/accounts", headers={
+                'Authorization': f'Zoho-oauthtoken {token}',
+                'Content-Type': 'application/json',
+            }, timeout=30)
+            resp.raise_for_status()
+            self._account_id = resp.json()['data'][0]['accountId']
+            return self._account_id
+
+    def close(self):
+        self.session.close()
+
+
+@lru_cache(maxsize=None)
+def _load_attachment(path: str) -> Tuple[str, bytes, str]:
+    p = Path(path)
+    mime = mimetypes.guess_type(str(p))[0] or 'application/octet-stream'
+    return p.name, p.read_bytes(), mime
@@ -1,34 +1,52 @@
 import os
+import re
+import mmap
 import base64
 import mimetypes
 import logging
+from functools import lru_cache
 from pathlib import Path
 from string import Template
-from typing import Dict, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 
 from core.models import Student, TemplateSpec
 
 logger = logging.getLogger(__name__)
 
+_TEMPLATE_FILE_PREFIX = 'TEMPLATE_FILE:'
+
+DEFAULT_IMAGES = {
+    "logo": "image/MBP.png",
+    "signature": "image/signature.png",
+    "qrcode": "image/qrcode.png",
+}
+
+_CID_SRC_RE = re.compile(r'src="cid:([^"]+)"')
+
 
 class EmailTemplateEngine:
 
     def __init__(self, subject_template: str, body_template: str):
         self.subject_tpl = Template(subject_template)
         self.body_tpl = Template(body_template)
+        self._subject_parts = _split_template(self.subject_tpl)
+        self._body_parts = _split_template(self.body_tpl)
 
     def create_personalized_email(self, student: Student) -> Dict[str, str]:
         v = student.template_vars
         return {
-            'subject': self.subject_tpl.safe_substitute(v),
-            'body': self.body_tpl.safe_substitute(v),
+            'subject': _render(self._subject_parts, v),
+            'body': _render(self._body_parts, v),
         }
 
+    def inline_images(self, image_map: Dict[str, str] = None):
+        self.body_tpl = Template(embed_images(self.body_tpl.template, image_map))
+        self._body_parts = _split_template(self.body_tpl)
+
     @staticmethod
     def load_template_file(path: str) -> str:
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = _read_template(path)
             logger.info(f"Template loaded: {path} ({len(content)} chars)")
             return content
         except Exception as e:
@@ -47,28 +65,68 @@ def resolve_templates(spec: TemplateSpec, config_data: dict = None,
             subject = tpl_cfg.get(spec.config_subject_key, subject)
         if spec.config_body_key:
             cfg_body = tpl_cfg.get(spec.config_body_key, '')
-            if cfg_body.startswith('TEMPLATE_FILE:'):
-                body = EmailTemplateEngine.load_template_file(cfg_body.replace('TEMPLATE_FILE:', ''))
+            if cfg_body.startswith(_TEMPLATE_FILE_PREFIX):
+                body = EmailTemplateEngine.load_template_file(cfg_body[len(_TEMPLATE_FILE_PREFIX):])
             elif cfg_body:
                 body = cfg_body
 
     return subject, body
 
 
+@lru_cache(maxsize=None)
+def _read_template(path: str) -> str:
+    return Path(path).read_text(encoding='utf-8')
+
+
+def _split_template(tpl: Template) -> List[Tuple[str, Optional[str]]]:
+    # (literal, None) runs and (placeholder, key) slots; _render matches safe_substitute.
+    parts = []
+    literal = []
+    pos = 0
+    for m in tpl.pattern.finditer(tpl.template):
+        literal.append(tpl.template[pos:m.start()])
+        pos = m.end()
+        key = m.group('named') or m.group('braced')
+        if key is None:
+            literal.append(tpl.delimiter if m.group('escaped') is not None else m.group())
+            continue
+        parts.append((''.join(literal), None))
+        parts.append((m.group(), key))
+        literal = []
+    literal.append(tpl.template[pos:])
+    parts.append((''.join(literal), None))
+    return parts
+
+
+def _render(parts: List[Tuple[str, Optional[str]]], values: Dict[str, str]) -> str:
+    return ''.join(text if key is None else str(values.get(key, text)) for text, key in parts)
+
+
 def embed_images(body: str, image_map: Dict[str, str] = None) -> str:
     if image_map is None:
-        image_map = {
-            "logo": "image/MBP.png",
-            "signature": "image/signature.png",
-            "qrcode": "image/qrcode.png",
-        }
+        image_map = DEFAULT_IMAGES
 
+    data_urls = {}
     for cid, path in image_map.items():
-        p = Path(path)
-        if not p.exists():
+        data_url = _image_data_url(path)
+        if data_url is None:
             logger.debug(f"Image not found for cid:{cid}: {path}")
             continue
-        b64 = base64.b64encode(p.read_bytes()).decode()
-        mime = mimetypes.guess_type(str(p))[0] or "image/png"
-        body = body.replace(f'src="cid:{cid}"', f'src="data:{mime};base64,{b64}"')
-    return body
+        data_urls[cid] = data_url
+
+    def replace(m):
+        data_url = data_urls.get(m.group(1))
+        return f'src="{data_url}"' if data_url else m.group()
+
+    return _CID_SRC_RE.sub(replace, body) if data_urls else body
+
+
+@lru_cache(maxsize=None)
+def _image_data_url(path: str) -> Optional[str]:
+    p = Path(path)
+    if not p.exists() or p.stat().st_size == 0:
+        return None
+    with open(p, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        b64 = base64.b64encode(mm).decode('ascii')
+    mime = mimetypes.guess_type(str(p))[0] or "image/png"
+    return f"data:{mime};base64,{b64}"
@@ -1,4 +1,5 @@
 import argparse
+import itertools
 import logging
 import sys
 from pathlib import Path
@@ -24,10 +25,12 @@ def parse_args():
     parser.add_argument('--template', choices=choices, default='welcome', help='Email template to use')
     parser.add_argument('--provider', choices=['zoho', 'gmail'], default='zoho')
     parser.add_argument('--test', action='store_true', help='Test mode: parse without sending')
+    parser.add_argument('--test-limit', type=_non_negative_int, default=20, help='Recipients to preview in test mode (0 = all)')
     parser.add_argument('--UG1', action='store_true', help='Use UG1_members_clean.csv')
     parser.add_argument('--bootcamp', action='store_true', help='Use bootcamp_applicants.csv')
     parser.add_argument('--subject', type=str, help='Custom subject (overrides template default)')
     parser.add_argument('--attach', type=str, help='Path to file attachment')
+    parser.add_argument('--workers', type=_positive_int, help='Concurrent sends per batch (overrides settings.max_workers)')
     return parser.parse_args(), config_data, specs
 
 
@@ -42,57 +45,101 @@ def main():
     settings = config_data.get('settings', {})
     spec = specs[args.template]
 
-    print(f"\U0001f3af EMAIL AUTOMATION SYSTEM")
-    print(f"   Provider: {args.provider.upper()}")
-    print(f"   Template: {spec.name} \u2014 {spec.description}")
-    print(f"   File:     {spec.template_file}")
-    print("=" * 40)
+    print('\n'.join([
+        "\U0001f3af EMAIL AUTOMATION SYSTEM",
+        f"   Provider: {args.provider.upper()}",
+        f"   Template: {spec.name} \u2014 {spec.description}",
+        f"   File:     {spec.template_file}",
+        "=" * 40,
+    ]))
 
     subject, body = resolve_templates(spec, config_data, args.subject)
     students = load_recipients(spec, args)
 
-    if not students:
+    first = next(students, None)
+    if first is None:
         print("\u274c No recipients found")
         return
+    students = itertools.chain([first], students)
 
     if args.test:
-        print(f"\U0001f9ea TEST MODE \u2014 {len(students)} recipients:")
-        for i, s in enumerate(students, 1):
+        print("\U0001f9ea TEST MODE \u2014 recipients:")
+        shown = 0
+        for i, s in enumerate(itertools.islice(students, args.test_limit or None), 1):
+            shown = i
             line = f"  {i:3d}. {s.name} <{s.email}>"
             if s.team_name:
                 line += f" \u2014 Team: {s.team_name}"
             if s.room_number:
                 line += f" | Room {s.room_number}, Slot {s.presentation_slot} at {s.presentation_time}"
             print(line)
-        print(f"\n\U0001f4ca Total: {len(students)} | \U0001f6ab No emails sent")
+        if next(students, None) is not None:
+            print("  ... more recipients not shown (--test-limit 0 lists all)")
+            print(f"\n\U0001f4ca Previewed: {shown} | \U0001f6ab No emails sent")
+        else:
+            print(f"\n\U0001f4ca Total: {shown} | \U0001f6ab No emails sent")
         return
 
     sender = create_sender(email_config)
     engine = EmailTemplateEngine(subject, body)
-    results = sender.send_bulk(
-        students, engine,
-        batch_size=settings.get('batch_size', 50),
-        batch_delay_min=settings.get('batch_delay_minutes', 1),
-        attachment_path=args.attach,
-        cc=spec.cc if spec.cc else None,
-        bcc=spec.bcc if spec.bcc else None,
-    )
-
-    total = len(students)
+    recipients = []
+    results = {'sent': 0, 'failed': 0}
+    try:
+        sender.send_bulk(
+            _track(students, recipients), engine,
+            batch_size=settings.get('batch_size', 50),
+            batch_delay_min=settings.get('batch_delay_minutes', 1),
+            attachment_path=args.attach,
+            cc=spec.cc if spec.cc else None,
+            bcc=spec.bcc if spec.bcc else None,
+            max_workers=args.workers if args.workers is not None else settings.get('max_workers', 1),
+            rate_per_sec=settings.get('send_rate_per_second'),
+            burst=settings.get('send_burst'),
+            results=results,
+        )
+    finally:
+        # A loader error can stop the run mid-way; the batch being read when it
+        # failed was never dispatched, so only the processed prefix is reported.
+        _report(recipients[:results['sent'] + results['failed']], results)
+
+
+def _report(recipients: list, results: dict):
+    total = len(recipients)
     sent = results['sent']
     rate = f"{sent/total*100:.1f}%" if total else "0%"
-    print(f"\u2705 Done: {sent}/{total} sent ({rate})")
+    summary = [f"\u2705 Done: {sent}/{total} sent ({rate})"]
     if results['failed']:
-        print(f"\u26a0\ufe0f  {results['failed']} failed")
+        summary.append(f"\u26a0\ufe0f  {results['failed']} failed")
+    print('\n'.join(summary))
 
     ResultsSaver.save({
         'total_emails': total,
         'emails_sent': sent,
         'emails_failed': results['failed'],
         'success_rate': rate,
-        'students': students,
+        'students': recipients,
     })
 
 
+def _non_negative_int(value: str) -> int:
+    n = int(value)
+    if n < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or greater, got {n}")
+    return n
+
+
+def _positive_int(value: str) -> int:
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be 1 or greater, got {n}")
+    return n
+
+
+def _track(students, seen: list):
+    for s in students:
+        seen.append(s)
+        yield s
+
+
 if __name__ == "__main__":
     main()